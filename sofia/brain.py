@@ -3,21 +3,24 @@ Módulo principal sofia.brain: Inicializa contexto e orquestra fluxo.
 """
 
 # 1. Standard library imports
-import re
-from datetime import datetime
+import time
+from collections import OrderedDict
 
 # 3. Local application imports
+from .core._patterns import FILE_EXT_RE, FILE_NAMING_RE, GREETING_RE
 from .core.responder import ResponderCore
 from .handlers.file_handler import FileHandler
 from .handlers.boards_handler import BoardsHandler
-from .handlers.general_handler import GeneralHandler
+from .handlers.general_handler import (
+    GeneralHandler, AprendizadoAtivoView, EtapaAprendizadoView,
+    aquecer_pool_conexoes
+)
 from src.services.api.openai.openai_service import OpenAIService
 from src.services.module.sharepoint.sharepoint_service import (
     SharePointService
 )
 from src.services.history.conversation_history import ConversationHistory
 from config.settings import CACHE_DURATION
-from src.services.constants import REGEX_PATTERNS
 
 
 class Sofia:
@@ -44,29 +47,56 @@ class Sofia:
 
     def _initialize_user_states(self):
         """Inicializa dicionários de estado por usuário."""
-        self.aprendizado_manual_ativo = {}
-        self.etapa_aprendizado = {}
+        self.aprendizado_state = {}
         self.modo_analise_boards = {}
         self.ultimo_colaborador_consultado = {}
         self.ultimo_board_por_usuario = {}
 
+    # Compatibilidade: visões de aprendizado_state com o formato dos antigos
+    # aprendizado_manual_ativo e etapa_aprendizado. Remover na próxima versão.
+    @property
+    def aprendizado_manual_ativo(self) -> AprendizadoAtivoView:
+        """user_id -> True ou {"pergunta": ...}, sobre aprendizado_state."""
+        return AprendizadoAtivoView(self.aprendizado_state)
+
+    @aprendizado_manual_ativo.setter
+    def aprendizado_manual_ativo(self, valores):
+        """Reatribuir (ex.: ``= {}`` num reset) substitui os estados."""
+        view = AprendizadoAtivoView(self.aprendizado_state)
+        view.clear()
+        view.update(valores)
+
+    @property
+    def etapa_aprendizado(self) -> EtapaAprendizadoView:
+        """user_id -> etapa, sobre aprendizado_state."""
+        return EtapaAprendizadoView(self.aprendizado_state)
+
+    @etapa_aprendizado.setter
+    def etapa_aprendizado(self, valores):
+        """Reatribuir (ex.: ``= {}`` num reset) substitui os estados."""
+        view = EtapaAprendizadoView(self.aprendizado_state)
+        view.clear()
+        view.update(valores)
+
     def _initialize_cache_system(self):
-        """Configura sistema de cache com timestamp e duração."""
-        self.boards_cache = {}
+        """Configura cache LRU com expiração (cache_duration) e tamanho máximo."""
+        self.boards_cache = OrderedDict()
         self.cache_duration = CACHE_DURATION
-        self._last_cache_cleanup = datetime.now()
+        self._cache_max = 512
+        self._last_cache_cleanup = time.monotonic()
 
     def _compile_regex_patterns(self):
-        """Pré-compila regex para arquivos e saudação."""
-        self.file_extension_pattern = re.compile(
-            REGEX_PATTERNS['file_extension'], re.IGNORECASE
-        )
-        self.file_naming_pattern = re.compile(
-            REGEX_PATTERNS['file_naming']
-        )
-        self.greeting_pattern = re.compile(
-            REGEX_PATTERNS['greeting'], re.IGNORECASE
-        )
+        """Expõe os regex de arquivos e saudação, compilados uma vez em
+        core._patterns."""
+        self.file_extension_pattern = FILE_EXT_RE
+        self.file_naming_pattern = FILE_NAMING_RE
+        self.greeting_pattern = GREETING_RE
+
+    def aquecer(self):
+        """Hook de inicialização da aplicação: pré-abre em segundo plano as
+        conexões do banco usadas no prompt. Não bloqueia; falhas são
+        logadas."""
+        aquecer_pool_conexoes()
 
     async def responder(self, user_id: str, user_message: str,
                         nome_usuario: str = None) -> str:
@@ -76,13 +106,31 @@ class Sofia:
             user_id, user_message, nome_usuario
         )
 
-    def _cleanup_cache(self):
-        """Remove entradas de cache expiradas com base em cache_duration."""
-        now = datetime.now()
-        expired = [
-            key for key, data in self.boards_cache.items()
-            if (now - data['timestamp']).seconds > self.cache_duration
-        ]
-        for key in expired:
+    def _cache_get(self, key):
+        """Retorna o valor em cache se ainda válido, marcando-o como recente."""
+        entry = self.boards_cache.get(key)
+        if entry is None:
+            return None
+        expire, value = entry
+        if expire < time.monotonic():
             del self.boards_cache[key]
+            return None
+        self.boards_cache.move_to_end(key)
+        return value
+
+    def _cache_set(self, key, value):
+        """Armazena valor com expiração e descarta os menos usados acima do
+        limite."""
+        self.boards_cache[key] = (time.monotonic() + self.cache_duration, value)
+        self.boards_cache.move_to_end(key)
+        while len(self.boards_cache) > self._cache_max:
+            self.boards_cache.popitem(last=False)
+
+    def _cleanup_cache(self):
+        """Remove entradas expiradas do início do LRU; as demais expiram ao
+        serem lidas em _cache_get."""
+        now = time.monotonic()
+        cache = self.boards_cache
+        while cache and next(iter(cache.values()))[0] < now:
+            cache.popitem(last=False)
         self._last_cache_cleanup = now
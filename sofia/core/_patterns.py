@@ -0,0 +1,134 @@
+"""Module core._patterns: Regex e conjuntos de palavras-chave pré-compilados
+compartilhados entre módulos."""
+
+# 1. Standard library imports
+import re
+import sys
+from operator import itemgetter
+from typing import Iterable, Iterator
+
+# 2. Third-party imports
+try:
+    import ahocorasick
+except ImportError:  # Extensão C opcional; há fallback em KeywordMatcher
+    ahocorasick = None
+
+# 3. Local application imports
+from src.services.constants import (
+    REGEX_PATTERNS, FILE_KEYWORDS, ACTION_KEYWORDS, CASUAL_WORDS,
+    ADMIN_COMMANDS, BOARDS_COMMANDS, LEARNING_TRIGGERS, LIST_PATTERNS
+)
+
+# Compilados uma única vez por processo
+FILE_EXT_RE = re.compile(REGEX_PATTERNS['file_extension'], re.IGNORECASE)
+FILE_NAMING_RE = re.compile(REGEX_PATTERNS['file_naming'])
+GREETING_RE = re.compile(REGEX_PATTERNS['greeting'], re.IGNORECASE)
+
+
+def normalize_keywords(words: Iterable[str]) -> frozenset:
+    """Palavras-chave em minúsculas, internadas e sem vazias/repetidas.
+    Toda comparação é feita contra a mensagem já em minúsculas."""
+    return frozenset(sys.intern(w.lower()) for w in words if w)
+
+
+class KeywordMatcher:
+    """Casa um conjunto fixo de palavras-chave em uma única varredura do texto
+    (Aho-Corasick). Sem pyahocorasick instalado, recorre a um regex de
+    alternação e a buscas por substring, com o mesmo resultado."""
+
+    def __init__(self, pares: Iterable[tuple[str, object]]):
+        """Recebe pares (palavra, valor); palavra repetida mantém o primeiro
+        valor e palavras vazias são ignoradas."""
+        self._pares = {}
+        for kw, valor in pares:
+            if kw:
+                self._pares.setdefault(kw, valor)
+        # Primeiro caractere de cada palavra: texto sem nenhum deles não
+        # pode conter palavra-chave e dispensa a varredura
+        self._iniciais = frozenset(kw[0] for kw in self._pares)
+
+        self._automaton = None
+        self._regex = None
+        self._por_tamanho = ()
+        if ahocorasick is not None and self._pares:
+            self._automaton = ahocorasick.Automaton()
+            for kw, valor in self._pares.items():
+                self._automaton.add_word(kw, valor)
+            self._automaton.make_automaton()
+        elif self._pares:
+            # Fallback: uma alternação compilada decide em C se há alguma
+            # ocorrência antes de procurar palavra por palavra
+            self._regex = re.compile("|".join(map(re.escape, self._pares)))
+            # Palavras em ordem crescente de tamanho: a busca por substring
+            # para na primeira maior que o texto
+            self._por_tamanho = tuple(sorted(
+                ((len(kw), kw, valor) for kw, valor in self._pares.items()),
+                key=itemgetter(0)
+            ))
+
+    @classmethod
+    def from_words(cls, words: Iterable[str]) -> "KeywordMatcher":
+        """Cria o matcher com as palavras normalizadas como valor."""
+        return cls((w, w) for w in normalize_keywords(words))
+
+    @classmethod
+    def from_groups(cls, grupos: Iterable[tuple[str, Iterable[str]]]
+                    ) -> "KeywordMatcher":
+        """Cria o matcher a partir de (rótulo, palavras); cada palavra tem
+        como valor o conjunto de rótulos dos grupos em que aparece."""
+        rotulos = {}
+        for rotulo, words in grupos:
+            for w in normalize_keywords(words):
+                rotulos.setdefault(w, set()).add(rotulo)
+        return cls((w, frozenset(r)) for w, r in rotulos.items())
+
+    def iter(self, texto: str) -> Iterator[object]:
+        """Gera o valor de cada palavra-chave encontrada no texto."""
+        if self._iniciais.isdisjoint(texto):
+            return
+        if self._automaton is not None:
+            for _, valor in self._automaton.iter(texto):
+                yield valor
+        elif self._regex is not None and self._regex.search(texto):
+            tamanho = len(texto)
+            for n, kw, valor in self._por_tamanho:
+                if n > tamanho:
+                    break
+                if kw in texto:
+                    yield valor
+
+    def labels(self, texto: str) -> set:
+        """Retorna os rótulos de todas as palavras-chave encontradas (para
+        matchers criados com from_groups)."""
+        achados = set()
+        for rotulos in self.iter(texto):
+            achados |= rotulos
+        return achados
+
+    def count(self, texto: str) -> int:
+        """Conta as palavras-chave distintas que ocorrem no texto (para
+        matchers criados com from_words)."""
+        return len(set(self.iter(texto)))
+
+    def search(self, texto: str) -> bool:
+        """Indica se alguma palavra-chave ocorre no texto."""
+        if self._automaton is None:
+            return (self._regex is not None and
+                    not self._iniciais.isdisjoint(texto) and
+                    self._regex.search(texto) is not None)
+        for _ in self.iter(texto):
+            return True
+        return False
+
+
+# Palavras-chave das intents (ADMIN_COMMANDS é iterado pelas chaves)
+ADMIN_KEYWORDS = normalize_keywords(ADMIN_COMMANDS)
+BOARDS_KEYWORDS = normalize_keywords(BOARDS_COMMANDS)
+LEARNING_KEYWORDS = normalize_keywords(LEARNING_TRIGGERS)
+LIST_KEYWORDS = normalize_keywords(LIST_PATTERNS)
+
+# Casadas por substring, como no critério original: "arquivo" também conta
+# em "arquivos"
+FILE_KEYWORDS_AC = KeywordMatcher.from_words(FILE_KEYWORDS)
+ACTION_KEYWORDS_AC = KeywordMatcher.from_words(ACTION_KEYWORDS)
+CASUAL_WORDS_AC = KeywordMatcher.from_words(CASUAL_WORDS)
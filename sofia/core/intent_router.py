@@ -1,5 +1,9 @@
 """Module core.intent_router: Roteia intents para os handlers para execução."""
 
+# 3. Local application imports
+from .message import NormalizedMessage
+
+
 class IntentRouter:
     """Gerencia o roteamento de intents para os handlers correspondentes."""
 
@@ -10,11 +14,15 @@ class IntentRouter:
 
         self.context = context
 
-    async def handle(self, intent: str, user_id: str, user_message: str,
+    async def handle(self, intent: str, user_id: str, msg: NormalizedMessage,
                      nome_usuario: str = None) -> str:
         """Dispara o handler apropriado com base na intent detectada.
+        Os métodos do contexto mantêm a assinatura original e recebem o
+        texto (str), não a mensagem normalizada.
         Returns: Resposta gerada pelo handler alvo."""
 
+        user_message = msg.raw
+
         if intent == "admin":
             return await self.context._handle_admin_commands(
                 user_id, user_message
@@ -32,7 +40,7 @@ class IntentRouter:
             return await self.context.listar_arquivos(
                 user_id,
                 user_message,
-                user_message.lower(),
+                msg.lower,
                 quantidade
             )
         if intent == "file":
@@ -0,0 +1,26 @@
+"""Module core.message: Mensagem do usuário normalizada uma única vez."""
+
+# 1. Standard library imports
+from dataclasses import dataclass
+
+
+@dataclass(frozen=True, slots=True)
+class NormalizedMessage:
+    """Texto original e suas formas normalizadas, calculadas uma vez por
+    requisição e repassadas aos handlers."""
+
+    raw: str
+    lower: str
+    tokens: frozenset[str]
+
+    @classmethod
+    def from_text(cls, raw: str) -> "NormalizedMessage":
+        """Cria a mensagem normalizada a partir do texto recebido."""
+        lower = raw.lower().strip()
+        return cls(raw, lower, frozenset(lower.split()))
+
+    @classmethod
+    def coerce(cls, msg: "str | NormalizedMessage") -> "NormalizedMessage":
+        """Aceita texto ou mensagem já normalizada, para que chamadas que
+        ainda passam str continuem funcionando."""
+        return msg if isinstance(msg, cls) else cls.from_text(msg)
@@ -1,17 +1,35 @@
 """Module core.responder: Inicializa serviços centrais e detecta intents."""
 
 # 1. Standard library imports
-import re
-import traceback
+import logging
 from functools import lru_cache
 from datetime import datetime
 
 # 3. Local application imports
+from ._patterns import (
+    FILE_EXT_RE, FILE_NAMING_RE, GREETING_RE, KeywordMatcher,
+    FILE_KEYWORDS_AC, ACTION_KEYWORDS_AC, CASUAL_WORDS_AC,
+    ADMIN_KEYWORDS, BOARDS_KEYWORDS, LEARNING_KEYWORDS, LIST_KEYWORDS
+)
 from .intent_router import IntentRouter
-from src.services.constants import (
-    ADMIN_COMMANDS, BOARDS_COMMANDS, LEARNING_TRIGGERS, LIST_PATTERNS,
-    GREETING_WORDS, FILE_KEYWORDS, ACTION_KEYWORDS, CASUAL_WORDS,
-    FILE_INTENT_INDICATORS, CASUAL_INDICATORS, REGEX_PATTERNS
+from .message import NormalizedMessage
+
+logger = logging.getLogger(__name__)
+
+# Grupos de palavras-chave por intent, em ordem de prioridade
+INTENT_KEYWORD_GROUPS = (
+    ("admin", ADMIN_KEYWORDS),
+    ("boards", BOARDS_KEYWORDS),
+    ("learning", LEARNING_KEYWORDS),
+    ("file_list", LIST_KEYWORDS),
+)
+
+# Autômato único mapeando cada palavra-chave para (prioridade, intent); palavra
+# repetida em dois grupos fica com o de maior prioridade
+_INTENT_AC = KeywordMatcher(
+    (kw, (prioridade, intent))
+    for prioridade, (intent, keywords) in enumerate(INTENT_KEYWORD_GROUPS)
+    for kw in keywords
 )
 
 
@@ -21,16 +39,6 @@ class ResponderCore:
     def __init__(self, context):
         self.context = context
         self.router = IntentRouter(context)
-        # Regex pré-compilados para detecção rápida de padrões
-        self.greeting_pattern = re.compile(
-            REGEX_PATTERNS['greeting'], re.IGNORECASE
-        )
-        self.file_extension_pattern = re.compile(
-            REGEX_PATTERNS['file_extension'], re.IGNORECASE
-        )
-        self.file_naming_pattern = re.compile(
-            REGEX_PATTERNS['file_naming']
-        )
 
     async def responder(self, user_id: str, user_message: str,
                         nome_usuario: str = None) -> str:
@@ -40,74 +48,83 @@ class ResponderCore:
         3. Roteia para handler.
         4. Loga a interação no histórico.
         Returns: Resposta do handler."""
-        
-        print(f"\n🔍 [DEBUG] Usuário: {user_id}, Mensagem: {user_message}")
+
+        logger.debug("Usuário: %s, Mensagem: %s", user_id, user_message)
 
         self.context._cleanup_cache()
-        intent = self._detect_intent(user_message, user_id)
+        msg = NormalizedMessage.from_text(user_message)
+        intent = self._detect_intent(msg, user_id)
 
         try:
             resposta = await self.router.handle(
-                intent, user_id, user_message, nome_usuario
+                intent, user_id, msg, nome_usuario
             )
         except Exception as e:
             resposta = self._handle_error_response(e, intent, user_id)
 
         return self._logar_interacao(user_id, user_message, resposta)
 
-    def _detect_intent(self, message: str, user_id: str) -> str:
+    def _detect_intent(self, msg: NormalizedMessage, user_id: str) -> str:
         """Identifica a intenção da mensagem.
         Verifica comandos admin, boards, learning, listagem, saudação, 
         critério de detecção de arquivo ou geral."""
 
-        message_lower = message.lower().strip()
-
-        if any(cmd in message_lower for cmd in ADMIN_COMMANDS.keys()):
+        # Comandos admin vêm antes do estado do usuário: são a saída de um
+        # fluxo de boards ou de aprendizado travado
+        keyword_intent = self._match_keyword_intent(msg.lower)
+        if keyword_intent == "admin":
             return "admin"
-        if (any(cmd in message_lower for cmd in BOARDS_COMMANDS) or
+        if (keyword_intent == "boards" or
                 user_id in self.context.modo_analise_boards):
             return "boards"
-        if (any(trig in message_lower for trig in LEARNING_TRIGGERS) or
-                user_id in self.context.aprendizado_manual_ativo):
+        if (keyword_intent == "learning" or
+                user_id in self.context.aprendizado_state):
             return "learning"
-        if any(pat in message_lower for pat in LIST_PATTERNS):
-            return "file_list"
-        if (len(message_lower.split()) <= 6 and
-                self.greeting_pattern.search(message_lower)):
+        if keyword_intent:
+            return keyword_intent
+        if (len(msg.lower.split()) <= 6 and
+                GREETING_RE.search(msg.lower)):
             return "greeting"
-        if self._calculate_file_score(message) > 0.7:
+        if self._calculate_file_score(msg.lower) > 0.7:
             return "file"
         return "general"
 
+    @staticmethod
+    @lru_cache(maxsize=1024)
+    def _match_keyword_intent(message_lower: str) -> str | None:
+        """Varre a mensagem uma única vez e retorna a intent de maior
+        prioridade entre as palavras-chave encontradas.
+        Depende só do texto; o estado do usuário é checado fora do cache."""
+
+        return min(_INTENT_AC.iter(message_lower), default=(None, None))[1]
+
+    @staticmethod
     @lru_cache(maxsize=256)
-    def _calculate_file_score(self, message: str) -> float:
+    def _calculate_file_score(m: str) -> float:
         """Método para identificar queries de arquivos, combinando extensão, keywords e 
-        nomeação."""
+        nomeação. Recebe a mensagem já em minúsculas."""
 
-        m = message.lower()
         score = 0.0
 
-        if self.file_extension_pattern.search(m):
+        if FILE_EXT_RE.search(m):
             score += 0.5
-        score += sum(0.2 for kw in FILE_KEYWORDS if kw in m)
-        score += sum(0.15 for kw in ACTION_KEYWORDS if kw in m)
-        if self.file_naming_pattern.search(m):
+        score += 0.2 * FILE_KEYWORDS_AC.count(m)
+        score += 0.15 * ACTION_KEYWORDS_AC.count(m)
+        if FILE_NAMING_RE.search(m):
             score += 0.2
-        score -= sum(0.2 for w in CASUAL_WORDS if w in m)
+        score -= 0.2 * CASUAL_WORDS_AC.count(m)
 
         return max(min(score, 1.0), 0.0)
 
     def _handle_error_response(self, e: Exception, intent: str,
                                user_id: str) -> str:
-        """Gera mensagem de erro padrão e exibe stack trace para debug."""
+        """Gera mensagem de erro padrão e registra o stack trace no log."""
 
         erro_id = f"ERR-{datetime.now().strftime('%Y%m%d-%H%M%S')}"
-        log = (
-            f"❌ [{erro_id}] Erro na intent '{intent}' do usuário "
-            f"'{user_id}': {type(e).__name__}: {e}"
+        logger.error(
+            "[%s] Erro na intent '%s' do usuário '%s': %s: %s",
+            erro_id, intent, user_id, type(e).__name__, e, exc_info=e
         )
-        print(log)
-        traceback.print_exc()
         return (
             "⚠️ Algo deu errado ao processar sua solicitação.\n"
             f"Código do erro: `{erro_id}`\n"
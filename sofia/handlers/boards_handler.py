@@ -3,13 +3,17 @@ Module handlers.boards_handler: Lida com intents relacionadas ao Azure Boards.
 """
 
 # 1. Standard library imports
-from datetime import datetime
-from typing import Optional
+import logging
+import re
+from collections import defaultdict
+from typing import NamedTuple, Optional
 
 # 2. Third-party imports
 import pandas as pd
 
 # 3. Local application imports
+from ..core._patterns import normalize_keywords
+from ..core.message import NormalizedMessage
 from src.services.constants import (
     BOARD_PROJECTS, CLIENT_SEARCH_KEYWORDS, BOARDS_HELP_MESSAGE,
     BOARDS_SELECTION_MESSAGE, CLIENT_KEYWORDS, ACTIVITY_KEYWORDS,
@@ -31,6 +35,49 @@ from src.services.module.boards.azure_boards_service import (
     AzureBoardsService
 )
 
+logger = logging.getLogger(__name__)
+
+# Tipos de item em uma única alternação, na ordem de MAPA_TIPOS_ITENS. O
+# lookahead não consome texto, então chaves sobrepostas ("story" dentro de
+# "user story") também são encontradas
+_MAPA_ALTERNATIVAS = "|".join(map(re.escape, MAPA_TIPOS_ITENS))
+_MAPA_COUNT_RE = re.compile(rf"(?=quant[oa]s ({_MAPA_ALTERNATIVAS}))")
+_MAPA_RE = re.compile(rf"(?=({_MAPA_ALTERNATIVAS}))")
+_MAPA_ORDEM = {chave: i for i, chave in enumerate(MAPA_TIPOS_ITENS)}
+
+
+def _tipo_prioritario(regex: re.Pattern, pt: str) -> Optional[str]:
+    """Entre as chaves de MAPA_TIPOS_ITENS presentes no texto, retorna o tipo
+    da primeira na ordem do dict (não a mais à esquerda no texto)."""
+    chave = min((m.group(1) for m in regex.finditer(pt)),
+                key=_MAPA_ORDEM.__getitem__, default=None)
+    return MAPA_TIPOS_ITENS[chave] if chave is not None else None
+
+# Palavras-chave em minúsculas e internadas; comparadas com a pergunta já
+# em minúsculas
+_CLIENT_SEARCH_KEYWORDS = normalize_keywords(CLIENT_SEARCH_KEYWORDS)
+_CLIENT_KEYWORDS = normalize_keywords(CLIENT_KEYWORDS)
+_ACTIVITY_KEYWORDS = normalize_keywords(ACTIVITY_KEYWORDS)
+_COLLABORATOR_REFERENCES = normalize_keywords(COLLABORATOR_REFERENCES)
+_PROGRESS_KEYWORDS = normalize_keywords(PROGRESS_KEYWORDS)
+_TODO_KEYWORDS = normalize_keywords(TODO_KEYWORDS)
+_COMPLETED_KEYWORDS = normalize_keywords(COMPLETED_KEYWORDS)
+_OVERVIEW_KEYWORDS = normalize_keywords(OVERVIEW_KEYWORDS)
+_OVERDUE_KEYWORDS = normalize_keywords(OVERDUE_KEYWORDS)
+_TASK_COUNT_KEYWORDS = normalize_keywords(TASK_COUNT_KEYWORDS)
+_HIERARCHY_KEYWORDS = normalize_keywords(HIERARCHY_KEYWORDS)
+
+
+class _BoardData(NamedTuple):
+    """Board em cache: o DataFrame e os metadados pré-calculados dele.
+
+    Os metadados ficam fora de ``df.attrs``: o pandas copia ``attrs`` em
+    profundidade a cada objeto derivado (colunas, comparações, filtros)."""
+
+    df: pd.DataFrame
+    # token do nome -> (ordem no board, responsável)
+    indice_responsaveis: dict[str, tuple[int, str]]
+
 
 class BoardsHandler:
     """Handler para análise e consulta de Azure Boards."""
@@ -38,7 +85,7 @@ class BoardsHandler:
     def __init__(self, context):
         self.context = context
 
-    async def responder_com_boards(self, pergunta: str,
+    async def responder_com_boards(self, pergunta: str | NormalizedMessage,
                                    user_id: str = "global") -> str:
         """Processa perguntas do usuário sobre Azure Boards.
 
@@ -47,7 +94,8 @@ class BoardsHandler:
         3. Busca dados.
         4. Encaminha para análise detalhada."""
 
-        pt = pergunta.lower()
+        msg = NormalizedMessage.coerce(pergunta)
+        pt = msg.lower
 
         # Se for pedido de ajuda, retorna mensagem padrão
         if pt in ["ajuda", "help", "comandos"]:
@@ -61,28 +109,23 @@ class BoardsHandler:
         self.context.ultimo_board_por_usuario[user_id] = projeto
         nome = "Operações" if projeto == "Sonar" else projeto
 
-        df = await self._get_boards_data_cached(projeto, pt)
-        if df is None:
+        board = await self._get_boards_data_cached(projeto, pt)
+        if board is None:
             return f"Erro ao consultar o Azure Boards de '{nome}'"
 
-        return self._process_boards_query(user_id, pt, df, nome)
+        return self._process_boards_query(user_id, msg, board, nome)
 
     async def _get_boards_data_cached(self, projeto: str,
                                       pt: str
-                                      ) -> Optional[pd.DataFrame]:
-        """Retorna DataFrame de work items."""
+                                      ) -> Optional[_BoardData]:
+        """Retorna DataFrame de work items com seus metadados."""
 
-        buscar_epicos = any(x in pt for x in CLIENT_SEARCH_KEYWORDS)
-        chave = (f"{projeto}_"
-                 f"{datetime.now().strftime('%Y%m%d_%H_%M')[:12]}")
-        if buscar_epicos:
-            chave += "_epicos"
+        buscar_epicos = any(x in pt for x in _CLIENT_SEARCH_KEYWORDS)
+        chave = (projeto, buscar_epicos)
 
-        cached = self.context.boards_cache.get(chave)
-        if (cached and
-                (datetime.now() - cached['timestamp']).seconds
-                < self.context.cache_duration):
-            return cached['dataframe']
+        cached = self.context._cache_get(chave)
+        if cached is not None:
+            return cached
 
         try:
             svc = AzureBoardsService(projeto)
@@ -90,29 +133,45 @@ class BoardsHandler:
             if not items:
                 return None
 
-            df = await processar_work_items_df(items, projeto,
-                                               buscar_epicos)
+            board = self._preparar_board(
+                await processar_work_items_df(items, projeto, buscar_epicos)
+            )
             # Armazena no cache para próxima consulta
-            self.context.boards_cache[chave] = {
-                'dataframe': df,
-                'timestamp': datetime.now()
-            }
-            return df
+            self.context._cache_set(chave, board)
+            return board
         except Exception as e:
-            print(f"❌ Erro ao buscar dados do board: {e}")
+            logger.error("Erro ao buscar dados do board: %s", e, exc_info=e)
             return None
 
-    def _process_boards_query(self, user_id: str, pt: str,
-                              df: pd.DataFrame, nome: str) -> str:
+    @staticmethod
+    def _preparar_board(df: pd.DataFrame) -> _BoardData:
+        """Pré-calcula, uma vez por DataFrame em cache, o tipo em minúsculas
+        (categórico, comparado por código inteiro) e um índice invertido
+        token -> (ordem, responsável)."""
+
+        df["_tipo_lower"] = df["tipo"].str.lower().astype("category")
+        indice = {}
+        for ordem, nome in enumerate(df["responsavel"].dropna().unique()):
+            for tok in nome.lower().split():
+                indice.setdefault(tok, (ordem, nome))
+        return _BoardData(df, indice)
+
+    def _process_boards_query(self, user_id: str, msg: NormalizedMessage,
+                              board: _BoardData, nome: str) -> str:
         """Encaminha query para atividade de cliente, colaborador específico ou geral.
         """
 
+        pt = msg.lower
+        df = board.df
+
         if self._is_client_activity_query(pt):
             if "sonar labs" in nome.lower():
                 return cliente_com_mais_atividades_sonar_labs(df)
             return cliente_com_mais_atividades(df, projeto=nome)
 
-        colaborador = self._detect_collaborator_in_query(pt, user_id, df)
+        colaborador = self._detect_collaborator_in_query(
+            msg, user_id, board.indice_responsaveis
+        )
         if colaborador:
             return self._process_collaborator_specific_query(
                 pt, df, colaborador
@@ -122,44 +181,47 @@ class BoardsHandler:
 
     def _is_client_activity_query(self, pt: str) -> bool:
         """Detecta queries sobre atividade de cliente."""
-        return (any(k in pt for k in CLIENT_KEYWORDS) and
-                any(a in pt for a in ACTIVITY_KEYWORDS))
+        return (any(k in pt for k in _CLIENT_KEYWORDS) and
+                any(a in pt for a in _ACTIVITY_KEYWORDS))
 
-    def _detect_collaborator_in_query(self, pt: str, user_id: str,
-                                      df: pd.DataFrame) -> Optional[str]:
+    def _detect_collaborator_in_query(self, msg: NormalizedMessage,
+                                      user_id: str,
+                                      indice: dict[str, tuple[int, str]]
+                                      ) -> Optional[str]:
         """Identifica colaborador em consultas usando tokens e histórico de último 
         colaborador."""
 
-        if any(ref in pt for ref in COLLABORATOR_REFERENCES):
+        if any(ref in msg.lower for ref in _COLLABORATOR_REFERENCES):
             return self.context.ultimo_colaborador_consultado.get(user_id)
 
-        tokens = set(pt.split())
-        for nome in df['responsavel'].dropna().unique():
-            if tokens & set(nome.lower().split()):
-                self.context.ultimo_colaborador_consultado[user_id] = nome
-                return nome
-        return None
+        hits = indice.keys() & msg.tokens
+        if not hits:
+            return None
+        # Menor ordem = primeiro responsável do board que casa algum token
+        _, nome = min(indice[tok] for tok in hits)
+        self.context.ultimo_colaborador_consultado[user_id] = nome
+        return nome
 
     def _process_collaborator_specific_query(self, pt: str,
                                              df: pd.DataFrame,
                                              nome: str) -> str:
         """Processa queries específicas para um colaborador."""
 
-        if any(t in pt for t in PROGRESS_KEYWORDS):
+        if any(t in pt for t in _PROGRESS_KEYWORDS):
             tasks = extrair_tarefas_por_colaborador_e_estado(
                 df, nome, "em andamento"
             )
             return formatar_lista_tarefas(
                 tasks, f"Tarefas em andamento de {nome}"
             )
-        if any(t in pt for t in TODO_KEYWORDS):
+        if any(t in pt for t in _TODO_KEYWORDS):
             tasks = extrair_tarefas_por_colaborador_e_estado(
                 df, nome, "a fazer"
             )
             return formatar_lista_tarefas(
                 tasks, f"Tarefas a fazer de {nome}"
             )
-        if any(t in pt for t in COMPLETED_KEYWORDS):
+        if any(t in pt for t in _COMPLETED_KEYWORDS):
             tasks = extrair_tarefas_por_colaborador_e_estado(
                 df, nome, "concluído"
             )
@@ -175,45 +237,43 @@ class BoardsHandler:
                                       nome: str) -> str:
         """Processa contagens, overviews, hierarquia e demais queries gerais."""
 
-        for chave, tipo in MAPA_TIPOS_ITENS.items():
-            if f"quantos {chave}" in pt or f"quantas {chave}" in pt:
-                total = len(df[df["tipo"].str.lower() == tipo])
-                return (
-                    f"🔢 Existem **{total}** item(ns) do tipo "
-                    f"**{tipo.title()}** no board {nome}."
-                )
-
-        for chave, tipo in MAPA_TIPOS_ITENS.items():
-            if chave in pt:
-                tasks = df[df["tipo"].str.lower() == tipo]
-                return formatar_lista_tarefas(
-                    tasks, f"{tipo.title()}s do board {nome}"
-                )
-
-        if any(k in pt for k in OVERVIEW_KEYWORDS):
+        if tipo := _tipo_prioritario(_MAPA_COUNT_RE, pt):
+            total = int((df["_tipo_lower"] == tipo).sum())
+            return (
+                f"🔢 Existem **{total}** item(ns) do tipo "
+                f"**{tipo.title()}** no board {nome}."
+            )
+
+        if tipo := _tipo_prioritario(_MAPA_RE, pt):
+            tasks = df[df["_tipo_lower"] == tipo]
+            return formatar_lista_tarefas(
+                tasks, f"{tipo.title()}s do board {nome}"
+            )
+
+        if any(k in pt for k in _OVERVIEW_KEYWORDS):
             return formatar_visao_geral(df)
-        if any(k in pt for k in TODO_KEYWORDS):
+        if any(k in pt for k in _TODO_KEYWORDS):
             return formatar_lista_tarefas(
                 tarefas_a_fazer(df),
                 f"Tarefas a fazer do board {nome}"
             )
-        if any(k in pt for k in PROGRESS_KEYWORDS):
+        if any(k in pt for k in _PROGRESS_KEYWORDS):
             return formatar_lista_tarefas(
                 tarefas_em_andamento(df),
                 f"Tarefas em andamento do board {nome}"
             )
-        if any(k in pt for k in OVERDUE_KEYWORDS):
+        if any(k in pt for k in _OVERDUE_KEYWORDS):
             return formatar_lista_tarefas(
                 tarefas_em_atraso(df),
                 f"Tarefas atrasadas do board {nome}"
             )
-        if any(k in pt for k in TASK_COUNT_KEYWORDS):
+        if any(k in pt for k in _TASK_COUNT_KEYWORDS):
             resp, qtd = obter_responsavel_com_mais_tarefas(df)
             return (
                 f"O colaborador com mais tarefas no total é {resp}, "
                 f"com {qtd} tarefas."
             )
-        if any(k in pt for k in HIERARCHY_KEYWORDS):
+        if any(k in pt for k in _HIERARCHY_KEYWORDS):
             return self._formatar_hierarquia_user_story(df)
 
         return formatar_visao_geral(df)
@@ -221,18 +281,24 @@ class BoardsHandler:
     def _formatar_hierarquia_user_story(self, df: pd.DataFrame) -> str:
         """Formata hierarquia de User Stories e suas Tasks."""
 
-        us = df[df["tipo"].str.lower() == "user story"]
-        ts = df[df["tipo"].str.lower() == "task"]
+        us = df[df["_tipo_lower"] == "user story"]
+        ts = df[df["_tipo_lower"] == "task"]
         if us.empty:
             return "❌ Nenhuma User Story encontrada no board."
 
+        # Agrupa as tasks por área uma única vez (áreas nulas não casam)
+        tasks_por_area = defaultdict(list)
+        for titulo, id_, area in ts[["titulo", "id", "area"]].itertuples(
+                index=False, name=None):
+            if not pd.isna(area):
+                tasks_por_area[area].append(f"   • {titulo} (#{id_})")
+
         linhas = []
-        for _, row in us.iterrows():
-            linhas.append(f"🔹 **{row['titulo']}** (#{row['id']})")
-            sub = ts[ts["area"] == row["area"]]
-            if sub.empty:
-                linhas.append("   • _(sem tasks registradas)_")
-            else:
-                for _, t in sub.iterrows():
-                    linhas.append(f"   • {t['titulo']} (#{t['id']})")
+        for titulo, id_, area in us[["titulo", "id", "area"]].itertuples(
+                index=False, name=None):
+            linhas.append(f"🔹 **{titulo}** (#{id_})")
+            linhas.extend(
+                tasks_por_area.get(area)
+                or ["   • _(sem tasks registradas)_"]
+            )
         return "\n".join(linhas)
@@ -3,11 +3,16 @@ Module handlers.file_handler: Lida com busca e listagem de arquivos.
 """
 
 # 1. Standard library imports
+import asyncio
+import logging
 import re
-import traceback
+import threading
 from datetime import datetime
+from functools import lru_cache
+from typing import Iterable, Iterator
 
 # 3. Local application imports
+from ..core._patterns import FILE_EXT_RE
 from src.services.constants import (
     FILE_NOT_FOUND_MESSAGE, FILE_SEARCH_NO_RESULTS,
     SHAREPOINT_CONFIG_ERROR, SHAREPOINT_DRIVE_ERROR,
@@ -15,9 +20,17 @@ from src.services.constants import (
     SINGLE_FILE_CLICK_INSTRUCTION, MULTIPLE_FILES_CLICK_INSTRUCTION,
     MAX_FILE_LIMIT, DEFAULT_FILE_LIMIT, MIN_WORD_LENGTH,
     URL_VALIDATION_PATTERNS, INVALID_URL_PATTERNS,
-    REGEX_PATTERNS, GRAPH_ENDPOINTS, ENDPOINTS_TIMEOUT
+    GRAPH_ENDPOINTS, ENDPOINTS_TIMEOUT
 )
 
+logger = logging.getLogger(__name__)
+
+# Padrões de URL combinados em um único regex e URLs inválidas normalizadas
+_VALID_URL_RE = re.compile(
+    "|".join(f"(?:{p})" for p in URL_VALIDATION_PATTERNS), re.IGNORECASE
+)
+_INVALID_URLS = frozenset(u.lower() for u in INVALID_URL_PATTERNS)
+
 
 class FileHandler:
     """Handler para intents de busca e listagem de arquivos."""
@@ -25,11 +38,7 @@ class FileHandler:
     def __init__(self, context):
         self.context = context
         self.sharepoint = context.sharepoint_service
-        self.cache = context.boards_cache
-        self.cache_duration = context.cache_duration
-        self.file_extension_pattern = re.compile(
-            REGEX_PATTERNS['file_extension'], re.IGNORECASE
-        )
+        self.file_extension_pattern = FILE_EXT_RE
 
     async def listar_arquivos(self, user_id: str, user_message: str,
                               msg_lower: str, quantidade: int = 10
@@ -43,7 +52,7 @@ class FileHandler:
             if not self._validate_sharepoint_config():
                 return self._get_sharepoint_config_error()
 
-            print(f"[DEBUG] Solicitando {quantidade} arquivos...")
+            logger.debug("Solicitando %d arquivos...", quantidade)
             arquivos = self.sharepoint.list_recent_files(limit=quantidade)
             if not arquivos:
                 return NO_FILES_MESSAGE
@@ -63,85 +72,123 @@ class FileHandler:
             return FILE_NOT_FOUND_MESSAGE
 
         key = f"search_{termo_busca.lower().replace(' ', '_')}"
-        cached = self.cache.get(key)
-        if (cached and
-                (datetime.now() - cached['timestamp']).seconds
-                < self.cache_duration):
-            return cached['result']
-
-        for strat in (
-            self._search_direct,
-            self._search_with_ai,
-            self._search_with_variations,
-            self._search_by_words
-        ):
-            try:
-                arquivos = await strat(termo_busca) \
-                    if strat.__name__ == '_search_with_ai' \
-                    else strat(termo_busca)
-                if arquivos:
-                    res = self._formatar_resultados_busca(
-                        termo_busca, arquivos
-                    )
-                    self.cache[key] = {
-                        'result': res,
-                        'timestamp': datetime.now()
-                    }
-                    return res
-            except Exception:
-                continue
+        cached = self.context._cache_get(key)
+        if cached is not None:
+            return cached
+
+        arquivos = await self._run_search_strategies(termo_busca)
+        if arquivos:
+            res = self._formatar_resultados_busca(termo_busca, arquivos)
+            self.context._cache_set(key, res)
+            return res
 
         return FILE_SEARCH_NO_RESULTS.format(termo_busca)
 
+    async def _run_search_strategies(self, termo: str) -> list | None:
+        """Tenta a busca direta; só se ela não encontrar nada, dispara as
+        demais estratégias em paralelo e retorna o resultado da primeira, em
+        ordem de prioridade, que encontrar arquivos."""
+
+        arquivos = await self._run_strategy(self._search_direct, termo)
+        if arquivos:
+            return arquivos
+
+        # Cancelar a task não interrompe uma thread já iniciada: o evento
+        # avisa as estratégias para não fazerem novas chamadas ao SharePoint
+        parar = threading.Event()
+        tarefas = [
+            asyncio.create_task(self._run_strategy(strat, termo, parar))
+            for strat in (
+                self._search_with_ai,
+                self._search_with_variations,
+                self._search_by_words
+            )
+        ]
+        try:
+            for tarefa in tarefas:
+                arquivos = await tarefa
+                if arquivos:
+                    return arquivos
+            return None
+        finally:
+            parar.set()
+            for tarefa in tarefas:
+                tarefa.cancel()
+
+    @staticmethod
+    async def _run_strategy(strat, *args) -> list | None:
+        """Executa uma estratégia; as síncronas rodam em thread para não
+        bloquear o event loop. Falhas contam como sem resultado."""
+
+        try:
+            if asyncio.iscoroutinefunction(strat):
+                return await strat(*args)
+            return await asyncio.to_thread(strat, *args)
+        except Exception:
+            return None
+
     def _search_direct(self, termo: str) -> list:
         """Busca direta via API do SharePoint."""
         return self.sharepoint.search_files(termo)
 
-    async def _search_with_ai(self, termo: str) -> list | None:
+    async def _search_with_ai(self, termo: str,
+                              parar: threading.Event) -> list | None:
         """Interpreta termo com OpenAI antes de buscar."""
 
         termo_limpo = await self.context.openai_service.\
             interpretar_termo_busca(termo)
-        if termo_limpo != termo:
-            return self.sharepoint.search_files(termo_limpo)
+        if termo_limpo != termo and not parar.is_set():
+            return await asyncio.to_thread(
+                self.sharepoint.search_files, termo_limpo
+            )
         return None
 
-    def _search_with_variations(self, termo: str) -> list | None:
-        """Gera variações do termo e tenta cada uma."""
+    def _search_with_variations(self, termo: str,
+                                parar: threading.Event) -> list | None:
+        """Gera variações distintas do termo e tenta cada uma até encontrar
+        arquivos ou receber o sinal de parada."""
 
-        vars_ = [
+        # dict.fromkeys remove repetidas mantendo a ordem; o termo original
+        # já é coberto pela busca direta
+        vars_ = dict.fromkeys((
             termo.replace(' ', '_'),
             termo.replace(' ', '-'),
             termo.replace('_', ' '),
             termo.replace('-', ' '),
             termo.lower(),
             termo.title()
-        ]
+        ))
+        vars_.pop(termo, None)
         for v in vars_:
+            if parar.is_set():
+                return None
             try:
-                if v != termo:
-                    arqs = self.sharepoint.search_files(v)
-                    if arqs:
-                        return arqs
+                arqs = self.sharepoint.search_files(v)
+                if arqs:
+                    return arqs
             except Exception:
                 continue
         return None
 
-    def _search_by_words(self, termo: str) -> list | None:
-        """Divide termo em palavras relevantes e busca por cada."""
-
-        words = [w for w in termo.split()
-                 if len(w) > MIN_WORD_LENGTH]
-        found = []
-        for w in words:
-            try:
-                arqs = self.sharepoint.search_files(w)
-                if arqs:
-                    found.extend(arqs)
-            except Exception:
-                continue
-        uniq = {f.get("name"): f for f in found if f.get("name")}
-        return list(uniq.values()) if uniq else None
+    def _search_by_words(self, termo: str,
+                         parar: threading.Event) -> list | None:
+        """Busca pela palavra relevante mais longa e filtra localmente pelos
+        arquivos cujo nome contém as demais."""
+
+        words = sorted((w.lower() for w in termo.split()
+                        if len(w) > MIN_WORD_LENGTH), key=len, reverse=True)
+        if not words or parar.is_set():
+            return None
+        candidatos = self.sharepoint.search_files(words[0]) or []
+        restantes = words[1:]
+        uniq = {}
+        for f in candidatos:
+            if parar.is_set():
+                return None
+            nome = (f.get("name") or "").lower()
+            if nome and all(w in nome for w in restantes):
+                uniq.setdefault(f["name"], f)
+        return list(uniq.values()) or None
 
     def _validate_sharepoint_config(self) -> bool:
         """Verifica se token e drive_id estão presentes."""
@@ -155,19 +202,19 @@ class FileHandler:
                 else SHAREPOINT_DRIVE_ERROR)
 
     def _build_file_list_response(self, qtd: int, total: int,
-                                  resultados: list) -> str:
+                                  resultados: Iterable[str]) -> str:
         """Monta a mensagem de resposta da listagem."""
+        linhas = "\n".join(resultados)
         return (
             f"📂 **{qtd} arquivos solicitados** "
             f"({total} encontrados):\n\n"
-            f"{chr(10).join(resultados)}\n\n"
+            f"{linhas}\n\n"
             f"{FILE_LIST_INSTRUCTIONS}"
         )
 
-    def _format_file_list(self, arquivos: list) -> list:
-        """Formata cada arquivo com nome, link válido e data."""
+    def _format_file_list(self, arquivos: list) -> Iterator[str]:
+        """Gera cada arquivo formatado com nome, link válido e data."""
 
-        linhas = []
         for i, arq in enumerate(arquivos, 1):
             nome = arq.get("name", "Sem nome")
             url = self._obter_url_valida(arq)
@@ -176,10 +223,9 @@ class FileHandler:
                 or arq.get("lastModifiedDateTime")
             )
             if url != "#":
-                linhas.append(f"{i}. **[{nome}]({url})** 📄 {dt}")
+                yield f"{i}. **[{nome}]({url})** 📄 {dt}"
             else:
-                linhas.append(f"{i}. **{nome}** 📄 {dt} ⚠️ *Link indisponível*")
-        return linhas
+                yield f"{i}. **{nome}** 📄 {dt} ⚠️ *Link indisponível*"
 
     def _formatar_resultados_busca(self, termo: str,
                                    arquivos: list) -> str:
@@ -208,7 +254,17 @@ class FileHandler:
                                       termo: str) -> str:
         """Formata resposta quando há múltiplos arquivos."""
 
-        lines = []
+        lines = "\n".join(self._format_search_lines(arquivos))
+        return (
+            f"📂 Encontrei **{len(arquivos)} arquivo(s)** "
+            f"para '**{termo}**':\n\n"
+            f"{lines}\n\n"
+            f"{MULTIPLE_FILES_CLICK_INSTRUCTION}"
+        )
+
+    def _format_search_lines(self, arquivos: list) -> Iterator[str]:
+        """Gera cada arquivo encontrado na busca com link e data."""
+
         for i, arq in enumerate(arquivos, 1):
             nome = arq.get("name", "Sem nome")
             url = self._obter_url_valida(arq)
@@ -216,13 +272,7 @@ class FileHandler:
                 arq.get("modified_time")
                 or arq.get("lastModifiedDateTime")
             )
-            lines.append(f"{i}. **[{nome}]({url})** 📄 {dt}")
-        return (
-            f"📂 Encontrei **{len(arquivos)} arquivo(s)** "
-            f"para '**{termo}**':\n\n"
-            f"{chr(10).join(lines)}\n\n"
-            f"{MULTIPLE_FILES_CLICK_INSTRUCTION}"
-        )
+            yield f"{i}. **[{nome}]({url})** 📄 {dt}"
 
     def _obter_url_valida(self, arq: dict) -> str:
         """Retorna primeira URL válida encontrada em campos web_url, url, 
@@ -230,18 +280,28 @@ class FileHandler:
 
         for f in ("web_url", "url", "server_url", "id"):
             url = arq.get(f)
-            if isinstance(url, str) and url.strip() and \
-               any(re.search(p, url.lower()) for p in URL_VALIDATION_PATTERNS)\
-               and url.lower().strip() not in INVALID_URL_PATTERNS:
+            if not isinstance(url, str) or not url.strip():
+                continue
+            if (_VALID_URL_RE.search(url) and
+                    url.lower().strip() not in _INVALID_URLS):
                 return url
         return "#"
 
-    def _formatar_data_com_hora(self, data_iso: str) -> str:
-        """Converte ISO timestamp para 'dd/mm/YYYY às HH:MM'."""
+    def _formatar_data_com_hora(self, data_iso: str | None) -> str:
+        """Converte ISO timestamp para 'dd/mm/YYYY às HH:MM', usando a data
+        atual quando ausente ou inválido."""
+
+        data = self._formatar_data_iso(data_iso) if data_iso else None
+        if data is None:
+            data = datetime.now().strftime('%d/%m/%Y às %H:%M')
+        return f"📅 Última modificação: {data}"
+
+    @staticmethod
+    @lru_cache(maxsize=2048)
+    def _formatar_data_iso(data_iso: str) -> str | None:
+        """Formata um ISO timestamp; cacheado pois listagens repetem datas.
+        Retorna None se o valor não puder ser interpretado."""
 
-        if not data_iso:
-            return f"📅 Última modificação: "\
-                   f"{datetime.now().strftime('%d/%m/%Y às %H:%M')}"
         try:
             if 'T' in data_iso:
                 fmt = "%Y-%m-%dT%H:%M:%SZ" if data_iso.endswith("Z") else \
@@ -249,16 +309,14 @@ class FileHandler:
                 dt = datetime.strptime(data_iso[:19], fmt)
             else:
                 dt = datetime.strptime(data_iso[:10], "%Y-%m-%d")
-            return f"📅 Última modificação: {dt.strftime('%d/%m/%Y às %H:%M')}"
+            return dt.strftime('%d/%m/%Y às %H:%M')
         except Exception:
-            return f"📅 Última modificação: "\
-                   f"{datetime.now().strftime('%d/%m/%Y às %H:%M')}"
+            return None
 
     def _handle_file_listing_error(self, e: Exception) -> str:
         """Gera mensagem de erro de listagem, diferenciando 400 e 401."""
 
-        print(f"❌ [ERRO] Falha na listagem: {e}")
-        traceback.print_exc()
+        logger.error("Falha na listagem: %s", e, exc_info=e)
         msg = str(e)
         if "400" in msg:
             return "⚠️ Solicitação inválida (erro 400)."
@@ -3,11 +3,17 @@ Module handlers.general_handler: Trate perguntas gerais e aprendizado.
 """
 
 # 1. Standard library imports
+import asyncio
+import logging
 import re
-from datetime import datetime
-from functools import lru_cache
+import time
+from collections.abc import MutableMapping
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
 
 # 3. Local application imports
+from ..core._patterns import KeywordMatcher
 from src.services.constants import (
     POSITIVE_WORDS, FILE_CONTEXT_WORDS, CASUAL_INDICATORS,
     FILE_INTENT_INDICATORS, LEARNING_TRIGGERS, LEARNING_STEPS,
@@ -29,6 +35,219 @@ from database.fragments.projeto_fragment import gerar_fragmento_projetos
 from database.fragments.participacao_fragment import \
     gerar_fragmento_participacoes
 
+logger = logging.getLogger(__name__)
+
+# Palavras-chave das conversas gerais em um único autômato, cada uma marcada
+# com as categorias a que pertence
+_GENERAL_AC = KeywordMatcher.from_groups((
+    ("positive", POSITIVE_WORDS),
+    ("file_ctx", FILE_CONTEXT_WORDS),
+    ("casual", CASUAL_INDICATORS),
+    ("file_intent", FILE_INTENT_INDICATORS),
+))
+_LEARN_AC = KeywordMatcher.from_words(LEARNING_TRIGGERS)
+
+# Autômato dos aprendizados manuais; recarregado após o TTL ou ao salvar
+_MANUAL_CACHE_TTL = 30
+_MANUAL_CACHE = {"ts": float("-inf"), "matcher": KeywordMatcher(())}
+
+
+def _normalizar_pergunta(texto: str) -> str:
+    """Forma em que a pergunta salva é comparada à mensagem em minúsculas."""
+    return texto.strip().lower()
+
+
+def _aprendizados_manuais() -> KeywordMatcher:
+    """Retorna o autômato pergunta normalizada -> (posição, resposta),
+    consultando o banco só quando o cache expira."""
+    agora = time.monotonic()
+    if agora - _MANUAL_CACHE["ts"] >= _MANUAL_CACHE_TTL:
+        conhecimentos = listar_conhecimentos_manuais(limit=50)
+        _MANUAL_CACHE["matcher"] = KeywordMatcher(
+            (perg_norm, (i, c.get("resposta")))
+            for i, c in enumerate(conhecimentos)
+            if (perg_norm := _normalizar_pergunta(c.get("pergunta", "")))
+        )
+        _MANUAL_CACHE["ts"] = agora
+    return _MANUAL_CACHE["matcher"]
+
+
+def _invalidar_aprendizados_manuais() -> None:
+    """Força a recarga dos aprendizados na próxima consulta."""
+    _MANUAL_CACHE["ts"] = float("-inf")
+
+
+# Fragmentos do banco + data; recarregados após o TTL, na virada do dia ou
+# ao salvar um aprendizado
+_FRAGMENTOS_TTL = 300
+_FRAGMENTOS_CACHE = {"ts": float("-inf"), "dia": None, "bloco": ""}
+
+MESES = (
+    "janeiro", "fevereiro", "março", "abril", "maio", "junho", "julho",
+    "agosto", "setembro", "outubro", "novembro", "dezembro",
+)
+
+# Geradores na ordem em que os fragmentos entram no prompt
+_GERADORES_FRAGMENTOS = (
+    gerar_fragmento_persona,
+    gerar_fragmento_empresa,
+    gerar_fragmento_setores,
+    gerar_fragmento_funcionarios,
+    gerar_fragmento_gerentes,
+    gerar_fragmento_projetos,
+    gerar_fragmento_participacoes,
+    gerar_fragmento_conhecimentos,
+    gerar_fragmento_cerimonias,
+)
+
+
+# Threads reaproveitadas entre recargas do cache de fragmentos
+_FRAGMENTOS_EXECUTOR = ThreadPoolExecutor(
+    max_workers=len(_GERADORES_FRAGMENTOS),
+    thread_name_prefix="sofia-fragmentos"
+)
+
+
+def _gerar_fragmento(gerador) -> str:
+    """Executa um gerador com sessão própria: sessões do SQLAlchemy não são
+    compartilháveis entre threads."""
+    with SessionLocal() as db:
+        return gerador(db)
+
+
+def _abrir_conexao() -> None:
+    """Abre uma conexão e a devolve ao pool do SQLAlchemy."""
+    with SessionLocal() as db:
+        db.connection()
+
+
+def _conexoes_a_aquecer() -> int:
+    """Quantas conexões vale pré-abrir: o pool só mantém ``size()`` delas
+    abertas, as excedentes são fechadas ao serem devolvidas."""
+    bind = getattr(SessionLocal, "kw", {}).get("bind")
+    pool = getattr(bind, "pool", None)
+    tamanho = getattr(pool, "size", None)
+    if callable(tamanho):
+        return min(tamanho(), len(_GERADORES_FRAGMENTOS))
+    return len(_GERADORES_FRAGMENTOS)
+
+
+def _registrar_falha_aquecimento(futuro) -> None:
+    """Loga a falha de uma conexão de aquecimento (ex.: banco fora do ar),
+    que de outra forma ficaria esquecida no Future."""
+    if not futuro.cancelled() and (erro := futuro.exception()) is not None:
+        logger.warning("Falha ao aquecer pool de conexões: %s", erro,
+                       exc_info=erro)
+
+
+def aquecer_pool_conexoes() -> None:
+    """Pré-abre em segundo plano as conexões usadas na geração de
+    fragmentos, para a primeira recarga não pagar o connect. Chamado uma
+    vez na inicialização da aplicação (Sofia.aquecer)."""
+    for _ in range(_conexoes_a_aquecer()):
+        futuro = _FRAGMENTOS_EXECUTOR.submit(_abrir_conexao)
+        futuro.add_done_callback(_registrar_falha_aquecimento)
+
+
+def _fragmentos_em_cache() -> str | None:
+    """Retorna o bloco fixo do prompt se o cache ainda vale (dentro do TTL e
+    do mesmo dia); None quando é preciso recarregar do banco."""
+    if (_FRAGMENTOS_CACHE["dia"] != date.today() or
+            time.monotonic() - _FRAGMENTOS_CACHE["ts"] >= _FRAGMENTOS_TTL):
+        return None
+    return _FRAGMENTOS_CACHE["bloco"]
+
+
+def _carregar_fragmentos() -> str:
+    """Retorna o bloco fixo do prompt (fragmentos do banco e data de hoje)
+    já unido, consultando o banco só quando o cache expira."""
+    if (bloco := _fragmentos_em_cache()) is None:
+        agora = time.monotonic()
+        hoje = date.today()
+        # Consultas em paralelo; map preserva a ordem dos geradores
+        frags = list(_FRAGMENTOS_EXECUTOR.map(_gerar_fragmento,
+                                              _GERADORES_FRAGMENTOS))
+
+        data_hoje = f"{hoje.day:02d} de {MESES[hoje.month - 1]} de {hoje.year}"
+        frags.append(
+            f"A data de hoje é {data_hoje}. Use para responder "
+            "perguntas como 'qual é o dia de hoje?'."
+        )
+        bloco = "\n\n".join(p for p in frags if p.strip())
+        _FRAGMENTOS_CACHE.update(ts=agora, dia=hoje, bloco=bloco)
+    return bloco
+
+
+def _invalidar_fragmentos() -> None:
+    """Força a recarga dos fragmentos na próxima geração de prompt."""
+    _FRAGMENTOS_CACHE["ts"] = float("-inf")
+
+
+@dataclass(slots=True)
+class AprendizadoState:
+    """Estado do fluxo de aprendizado manual de um usuário."""
+
+    etapa: int
+    pergunta: str | None = None
+
+
+class _AprendizadoView(MutableMapping):
+    """Visão de compatibilidade sobre ``aprendizado_state`` no formato dos
+    dicionários antigos, para código fora do pacote que ainda os lê ou
+    limpa. Remover um usuário encerra o fluxo dele. Remover na próxima
+    versão."""
+
+    def __init__(self, estados: dict):
+        self._estados = estados
+
+    def __getitem__(self, user_id):
+        return self._ler(self._estados[user_id])
+
+    def __setitem__(self, user_id, valor):
+        estado = self._estados.get(user_id)
+        if estado is None:
+            estado = self._estados[user_id] = AprendizadoState(
+                etapa=LEARNING_STEPS['pergunta']
+            )
+        self._gravar(estado, valor)
+
+    def __delitem__(self, user_id):
+        del self._estados[user_id]
+
+    def __iter__(self):
+        return iter(self._estados)
+
+    def __len__(self):
+        return len(self._estados)
+
+
+class EtapaAprendizadoView(_AprendizadoView):
+    """Antigo ``etapa_aprendizado``: user_id -> etapa."""
+
+    @staticmethod
+    def _ler(estado: AprendizadoState) -> int:
+        return estado.etapa
+
+    @staticmethod
+    def _gravar(estado: AprendizadoState, etapa: int) -> None:
+        estado.etapa = etapa
+
+
+class AprendizadoAtivoView(_AprendizadoView):
+    """Antigo ``aprendizado_manual_ativo``: user_id -> True até a pergunta
+    ser informada, depois {"pergunta": ...}."""
+
+    @staticmethod
+    def _ler(estado: AprendizadoState) -> bool | dict:
+        if estado.pergunta is None:
+            return True
+        return {"pergunta": estado.pergunta}
+
+    @staticmethod
+    def _gravar(estado: AprendizadoState, valor) -> None:
+        if isinstance(valor, dict):
+            estado.pergunta = valor.get("pergunta")
+
 
 class GeneralHandler:
     """Handler para perguntas gerais e fluxo de aprendizado manual."""
@@ -42,19 +261,21 @@ class GeneralHandler:
         """Processa dúvidas gerais, aprendizado e fallback de AI."""
 
         ml = user_message.lower()
+        # Uma única varredura de ml decide todas as categorias abaixo
+        flags = _GENERAL_AC.labels(ml)
 
-        if self._is_courtesy_message(ml):
+        if self._flags_is_courtesy(flags):
             return COURTESY_RESPONSE
 
         if nome_usuario and "meu nome" in ml:
             return f"Claro! Você é {nome_usuario}, certo? 😄"
 
-        resp_manual = self.responder_com_aprendizados_manuais(user_message)
+        resp_manual = self.responder_com_aprendizados_manuais(ml)
         if resp_manual:
             return resp_manual
 
-        is_casual = self._is_casual_conversation(ml)
-        has_file = self._has_file_intent(ml)
+        is_casual = self._flags_is_casual(flags)
+        has_file = self._flags_has_file_intent(flags)
         if not is_casual and has_file:
             termo = self.context._extract_search_term(user_message)
             if termo:
@@ -64,59 +285,73 @@ class GeneralHandler:
 
         return await self._process_with_openai(user_id, user_message)
 
+    @staticmethod
+    def _flags_is_courtesy(flags: set[str]) -> bool:
+        """Detecta mensagens positivas sem contexto de arquivo, a partir das
+        categorias de _GENERAL_AC."""
+        return "file_ctx" not in flags and "positive" in flags
+
+    @staticmethod
+    def _flags_is_casual(flags: set[str]) -> bool:
+        """Detecta conversas casuais, a partir das categorias de _GENERAL_AC."""
+        return "casual" in flags
+
+    @staticmethod
+    def _flags_has_file_intent(flags: set[str]) -> bool:
+        """Detecta quando o usuário quer buscar arquivo, a partir das
+        categorias de _GENERAL_AC."""
+        return "file_intent" in flags
+
     def _is_courtesy_message(self, ml: str) -> bool:
         """Detecta mensagens positivas sem contexto de arquivo."""
-        return (any(w in ml for w in POSITIVE_WORDS) and
-                not any(w in ml for w in FILE_CONTEXT_WORDS))
+        return self._flags_is_courtesy(_GENERAL_AC.labels(ml.lower()))
 
     def _is_casual_conversation(self, ml: str) -> bool:
         """Detecta conversas casuais."""
-        return any(p in ml for p in CASUAL_INDICATORS)
+        return self._flags_is_casual(_GENERAL_AC.labels(ml.lower()))
 
     def _has_file_intent(self, ml: str) -> bool:
         """Detecta quando o usuário quer buscar arquivo."""
-        return any(p in ml for p in FILE_INTENT_INDICATORS)
-
-    def responder_com_aprendizados_manuais(self, pergunta: str) -> \
-            str | None:
-        """Retorna resposta se a pergunta já existe em aprendizados manuais."""
-        txt = pergunta.strip().lower()
-        for conhec in listar_conhecimentos_manuais(limit=50):
-            if conhec.get("pergunta", "").strip().lower() in txt:
-                return conhec.get("resposta")
-        return None
+        return self._flags_has_file_intent(_GENERAL_AC.labels(ml.lower()))
+
+    def responder_com_aprendizados_manuais(self, ml: str) -> str | None:
+        """Retorna resposta se a pergunta já existe em aprendizados manuais.
+        Recebe a mensagem já em minúsculas."""
+        # Menor posição = primeiro aprendizado da listagem que casa o texto
+        hit = min(_aprendizados_manuais().iter(ml), default=None)
+        return hit[1] if hit else None
 
-    def verificar_aprendizado_manual(self, user_id: str,
-                                     user_message: str) -> bool:
-        """Inicia o fluxo de aprendizado manual quando trigger é detectado."""
-        msg = user_message.strip().lower()
-        if any(p in msg for p in LEARNING_TRIGGERS):
-            self.context.aprendizado_manual_ativo[user_id] = True
-            self.context.etapa_aprendizado[user_id] = \
-                LEARNING_STEPS['pergunta']
+    def verificar_aprendizado_manual(self, user_id: str, user_message: str,
+                                     ml: str | None = None) -> bool:
+        """Inicia o fluxo de aprendizado manual quando trigger é detectado.
+        Aceita a mensagem já em minúsculas (ml) para evitar nova cópia."""
+        if ml is None:
+            ml = user_message.lower()
+        if _LEARN_AC.search(ml):
+            self.context.aprendizado_state[user_id] = AprendizadoState(
+                etapa=LEARNING_STEPS['pergunta']
+            )
             return True
-        return user_id in self.context.aprendizado_manual_ativo
+        return user_id in self.context.aprendizado_state
 
     def processar_aprendizado_manual(self, user_id: str,
                                     user_message: str) -> str:
         """Continua o fluxo de aprendizado manual conforme etapa atual."""
 
-        etapa = self.context.etapa_aprendizado.get(user_id)
-        if etapa == LEARNING_STEPS['pergunta']:
-            self.context.aprendizado_manual_ativo[user_id] = {
-                "pergunta": user_message
-            }
-            self.context.etapa_aprendizado[user_id] = \
-                LEARNING_STEPS['resposta']
+        estado = self.context.aprendizado_state.get(user_id)
+        if estado is None:
+            return LEARNING_ERROR_RETRY
+
+        if estado.etapa == LEARNING_STEPS['pergunta']:
+            estado.pergunta = user_message.strip()
+            estado.etapa = LEARNING_STEPS['resposta']
             return LEARNING_QUESTION_PROMPT
 
-        if etapa == LEARNING_STEPS['resposta']:
-            perg = self.context.aprendizado_manual_ativo[user_id][
-                "pergunta"
-            ]
-            msg = salvar_aprendizado_manual(perg, user_message)
-            del self.context.aprendizado_manual_ativo[user_id]
-            del self.context.etapa_aprendizado[user_id]
+        if estado.etapa == LEARNING_STEPS['resposta']:
+            msg = salvar_aprendizado_manual(estado.pergunta, user_message)
+            _invalidar_aprendizados_manuais()
+            _invalidar_fragmentos()
+            del self.context.aprendizado_state[user_id]
             return msg
 
         return LEARNING_ERROR_RETRY
@@ -126,11 +361,19 @@ class GeneralHandler:
         """Fallback que chama o OpenAIService para gerar a resposta geral."""
 
         try:
-            tom = await self.context.openai_service.\
+            tom_coro = self.context.openai_service.\
                 classificar_tom_mensagem(user_message)
-            print(f"🎨 [DEBUG] Tom detectado: {tom}")
+            bloco = _fragmentos_em_cache()
+            if bloco is None:
+                # Recarga do banco em thread, em paralelo ao tom (OpenAI)
+                tom, bloco = await asyncio.gather(
+                    tom_coro, asyncio.to_thread(_carregar_fragmentos)
+                )
+            else:
+                tom = await tom_coro
+            logger.debug("Tom detectado: %s", tom)
 
-            prompt = self.gerar_system_prompt(tom=tom)
+            prompt = self._montar_prompt(bloco, tom)
             hist = self.context.conversation_history.\
                 format_for_prompt(user_id)
 
@@ -143,41 +386,33 @@ class GeneralHandler:
                 )
             return resposta or OPENAI_FALLBACK_MESSAGE
         except Exception as e:
-            print(f"❌ Erro OpenAI: {e}")
+            logger.error("Erro OpenAI: %s", e, exc_info=e)
             return OPENAI_FALLBACK_MESSAGE
 
-    @lru_cache(maxsize=32)
     def gerar_system_prompt(self, historico_conversa: str = "",
                             tom: str = "neutro") -> str:
-        """Gera o prompt de sistema concatenando fragmentos de conhecimento."""
-        
-        with SessionLocal() as db:
-            frags = [
-                gerar_fragmento_persona(db),
-                gerar_fragmento_empresa(db),
-                gerar_fragmento_setores(db),
-                gerar_fragmento_funcionarios(db),
-                gerar_fragmento_gerentes(db),
-                gerar_fragmento_projetos(db),
-                gerar_fragmento_participacoes(db),
-                gerar_fragmento_conhecimentos(db),
-                gerar_fragmento_cerimonias(db),
-            ]
-
-        hoje = datetime.now().strftime("%d de %B de %Y")
-        frags.append(
-            f"A data de hoje é {hoje}. Use para responder "
-            "perguntas como 'qual é o dia de hoje?'."
-        )
+        """Gera o prompt de sistema concatenando fragmentos de conhecimento
+        (cacheados) com o tom e o histórico da conversa."""
+
+        return self._montar_prompt(_carregar_fragmentos(), tom,
+                                   historico_conversa)
+
+    @staticmethod
+    def _montar_prompt(bloco: str, tom: str,
+                       historico_conversa: str = "") -> str:
+        """Acrescenta ao bloco fixo a instrução de tom e o histórico."""
+
+        # Só o tom e o histórico variam; o bloco fixo já vem unido do cache
+        partes = [bloco]
 
         if tom == "animado":
-            frags.append(
+            partes.append(
                 "Adote um tom leve, simpático e entusiasmado, com emoticons. 😊"
             )
         elif tom == "sério":
-            frags.append("Adote um tom mais formal, direto e profissional.")
+            partes.append("Adote um tom mais formal, direto e profissional.")
 
-        if historico_conversa:
-            frags.append(historico_conversa)
+        if historico_conversa.strip():
+            partes.append(historico_conversa)
 
-        return "\n\n".join(p for p in frags if p.strip())
+        return "\n\n".join(partes)